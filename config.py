@@ -1,12 +1,25 @@
 import os
 from dataclasses import dataclass
-from typing import Optional
+from typing import Any, Callable, Optional
 from dotenv import load_dotenv
 
 load_dotenv()
 
+SUPPORTED_MODES = frozenset({'volume', 'dual'})
 
-@dataclass
+
+def _parse_bool(value: str) -> bool:
+    """Parse a 'true'/'false' environment value"""
+    return value.lower() == 'true'
+
+
+def _env(key: str, default: Any, cast: Callable[[str], Any] = str) -> Any:
+    """Read an environment variable, converting it with cast when set"""
+    value = os.environ.get(key)
+    return default if value is None else cast(value)
+
+
+@dataclass(frozen=True)
 class ApiConfig:
     """API configuration settings"""
     api_key: str
@@ -17,9 +30,20 @@ class ApiConfig:
     timeout: int = 5
     retry_attempts: int = 3
     retry_delay: int = 1
+    ws_base_url: str = 'wss://fstream.asterdex.com'
+    use_websocket_streams: bool = False
+    order_rate_limit: float = 10.0
+
+    def __post_init__(self):
+        """Validate API credentials and client limits"""
+        if not self.api_key or not self.api_secret:
+            raise ValueError("API_KEY and API_SECRET must be set in .env file")
+
+        if self.order_rate_limit < 1:
+            raise ValueError("ORDER_RATE_LIMIT must be at least 1 order per second")
 
 
-@dataclass
+@dataclass(frozen=True)
 class TradingConfig:
     """Trading configuration settings"""
     mode: str
@@ -31,16 +55,40 @@ class TradingConfig:
     max_loss_usdt: float
     min_cycle_delay_sec: int
     max_cycle_delay_sec: int
+    seed: Optional[int] = None
+
+    def __post_init__(self):
+        """Validate mode-independent trading settings"""
+        if self.mode not in SUPPORTED_MODES:
+            raise ValueError("Invalid mode. Supported modes: 'volume', 'dual'")
+
+        if self.leverage < 1 or self.leverage > 100:
+            raise ValueError("Leverage must be between 1 and 100")
+
+        if self.liquidity_multiplier < 1.0:
+            raise ValueError("Liquidity multiplier must be at least 1.0")
+
+        if self.balance_percentage < 1 or self.balance_percentage > 100:
+            raise ValueError("Balance percentage must be between 1 and 100")
+
+        if self.max_loss_usdt <= 0:
+            raise ValueError("MAX_LOSS_USDT must be greater than 0")
+
+        if self.min_cycle_delay_sec < 0:
+            raise ValueError("MIN_CYCLE_DELAY_SEC must be non-negative")
+
+        if self.max_cycle_delay_sec < self.min_cycle_delay_sec:
+            raise ValueError("MAX_CYCLE_DELAY_SEC must be greater than MIN_CYCLE_DELAY_SEC")
 
 
-@dataclass
+@dataclass(frozen=True)
 class VolumeTradingConfig:
     """Volume trading mode configuration settings"""
     min_close_time_sec: int
     max_close_time_sec: int
 
 
-@dataclass
+@dataclass(frozen=True)
 class DualTradingConfig:
     """Dual account trading mode configuration settings"""
     max_position_deviation_percent: float
@@ -62,78 +110,58 @@ class Config:
     def _load_api_config() -> ApiConfig:
         """Load API configuration from environment variables"""
         return ApiConfig(
-            api_key=os.getenv('API_KEY', ''),
-            api_secret=os.getenv('API_SECRET', ''),
-            api_key2=os.getenv('API_KEY2'),
-            api_secret2=os.getenv('API_SECRET2'),
-            base_url=os.getenv('BASE_URL', 'https://fapi.asterdex.com'),
-            timeout=int(os.getenv('REQUEST_TIMEOUT', '5')),
-            retry_attempts=int(os.getenv('RETRY_ATTEMPTS', '3')),
-            retry_delay=int(os.getenv('RETRY_DELAY', '1'))
+            api_key=_env('API_KEY', ''),
+            api_secret=_env('API_SECRET', ''),
+            api_key2=_env('API_KEY2', None),
+            api_secret2=_env('API_SECRET2', None),
+            base_url=_env('BASE_URL', 'https://fapi.asterdex.com'),
+            timeout=_env('REQUEST_TIMEOUT', 5, int),
+            retry_attempts=_env('RETRY_ATTEMPTS', 3, int),
+            retry_delay=_env('RETRY_DELAY', 1, int),
+            ws_base_url=_env('WS_BASE_URL', 'wss://fstream.asterdex.com'),
+            use_websocket_streams=_env('USE_WEBSOCKET_STREAMS', False, _parse_bool),
+            order_rate_limit=_env('ORDER_RATE_LIMIT', 10.0, float)
         )
 
     @staticmethod
     def _load_trading_config() -> TradingConfig:
         """Load trading configuration from environment variables"""
         return TradingConfig(
-            mode=os.getenv('MODE', 'volume').lower(),
-            symbol=os.getenv('SYMBOL', 'BTCUSDT'),
-            leverage=int(os.getenv('LEVERAGE', '20')),
-            liquidity_multiplier=float(os.getenv('LIQUIDITY_MULTIPLIER', '1.2')),
-            balance_percentage=float(os.getenv('BALANCE_PERCENTAGE', '50')),
-            hedge_mode=os.getenv('HEDGE_MODE', 'true').lower() == 'true',
-            max_loss_usdt=float(os.getenv('MAX_LOSS_USDT', '100')),
-            min_cycle_delay_sec=int(os.getenv('MIN_CYCLE_DELAY_SEC', '5')),
-            max_cycle_delay_sec=int(os.getenv('MAX_CYCLE_DELAY_SEC', '15'))
+            mode=_env('MODE', 'volume').lower(),
+            symbol=_env('SYMBOL', 'BTCUSDT'),
+            leverage=_env('LEVERAGE', 20, int),
+            liquidity_multiplier=_env('LIQUIDITY_MULTIPLIER', 1.2, float),
+            balance_percentage=_env('BALANCE_PERCENTAGE', 50.0, float),
+            hedge_mode=_env('HEDGE_MODE', True, _parse_bool),
+            max_loss_usdt=_env('MAX_LOSS_USDT', 100.0, float),
+            min_cycle_delay_sec=_env('MIN_CYCLE_DELAY_SEC', 5, int),
+            max_cycle_delay_sec=_env('MAX_CYCLE_DELAY_SEC', 15, int),
+            seed=_env('RANDOM_SEED', None, int)
         )
 
     @staticmethod
     def _load_volume_config() -> VolumeTradingConfig:
         """Load volume trading configuration from environment variables"""
         return VolumeTradingConfig(
-            min_close_time_sec=int(os.getenv('MIN_CLOSE_TIME_SEC', '10')),
-            max_close_time_sec=int(os.getenv('MAX_CLOSE_TIME_SEC', '30'))
+            min_close_time_sec=_env('MIN_CLOSE_TIME_SEC', 10, int),
+            max_close_time_sec=_env('MAX_CLOSE_TIME_SEC', 30, int)
         )
 
     @staticmethod
     def _load_dual_config() -> DualTradingConfig:
         """Load dual account configuration from environment variables"""
         return DualTradingConfig(
-            max_position_deviation_percent=float(os.getenv('MAX_POSITION_DEVIATION_PERCENT', '20')),
-            min_hold_time_sec=int(os.getenv('DUAL_MIN_HOLD_TIME_SEC', '30')),
-            max_hold_time_sec=int(os.getenv('DUAL_MAX_HOLD_TIME_SEC', '300'))
+            max_position_deviation_percent=_env('MAX_POSITION_DEVIATION_PERCENT', 20.0, float),
+            min_hold_time_sec=_env('DUAL_MIN_HOLD_TIME_SEC', 30, int),
+            max_hold_time_sec=_env('DUAL_MAX_HOLD_TIME_SEC', 300, int)
         )
 
     def _validate_config(self):
-        """Validate configuration parameters"""
-        if not self.api.api_key or not self.api.api_secret:
-            raise ValueError("API_KEY and API_SECRET must be set in .env file")
-
+        """Validate settings that depend on the selected mode"""
         if self.trading.mode == 'dual':
             if not self.api.api_key2 or not self.api.api_secret2:
                 raise ValueError("API_KEY2 and API_SECRET2 must be set for dual mode")
 
-        if self.trading.leverage < 1 or self.trading.leverage > 100:
-            raise ValueError("Leverage must be between 1 and 100")
-
-        if self.trading.liquidity_multiplier < 1.0:
-            raise ValueError("Liquidity multiplier must be at least 1.0")
-
-        if self.trading.balance_percentage < 1 or self.trading.balance_percentage > 100:
-            raise ValueError("Balance percentage must be between 1 and 100")
-
-        if self.trading.mode not in ['volume', 'dual']:
-            raise ValueError("Invalid mode. Supported modes: 'volume', 'dual'")
-
-        if self.trading.max_loss_usdt <= 0:
-            raise ValueError("MAX_LOSS_USDT must be greater than 0")
-
-        if self.trading.min_cycle_delay_sec < 0:
-            raise ValueError("MIN_CYCLE_DELAY_SEC must be non-negative")
-
-        if self.trading.max_cycle_delay_sec < self.trading.min_cycle_delay_sec:
-            raise ValueError("MAX_CYCLE_DELAY_SEC must be greater than MIN_CYCLE_DELAY_SEC")
-
         if self.trading.mode == 'volume':
             if self.volume.min_close_time_sec < 1:
                 raise ValueError("MIN_CLOSE_TIME_SEC must be at least 1 second")
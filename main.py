@@ -1,11 +1,49 @@
 import asyncio
+import logging
+import queue
+import signal
+import sys
+from logging.handlers import QueueHandler, QueueListener
 from config import Config
-from src.core import AsterApiClient
+from src.core import AsterApiClient, BookTickerStream, UserDataStream
 from src.utils import PositionCalculator
-from src.bots import VolumeTradingBot, DualAccountBot
+
+try:
+    import uvloop
+except ImportError:
+    # Not available on Windows; the default event loop is used instead
+    uvloop = None
+
+
+def setup_logging() -> QueueListener:
+    """Hand log records to a background thread so terminal writes never block the event loop"""
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter('%(message)s'))
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    root_logger.addHandler(QueueHandler(log_queue))
+
+    listener = QueueListener(log_queue, stream_handler)
+    listener.start()
+    return listener
+
+
+def install_shutdown_handler():
+    """Cancel the main task on Ctrl+C/SIGTERM so the bots can close positions before exiting"""
+    loop = asyncio.get_running_loop()
+    main_task = asyncio.current_task()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, main_task.cancel)
+        except NotImplementedError:
+            # Windows event loops have no signal handlers; Ctrl+C raises KeyboardInterrupt instead
+            pass
 
 
 async def main():
+    install_shutdown_handler()
     config = Config()
 
     calculator = PositionCalculator(
@@ -14,12 +52,23 @@ async def main():
     )
 
     if config.trading.mode == 'volume':
+        from src.bots import VolumeTradingBot
+
         api_client = AsterApiClient(
             config.api.api_key,
             config.api.api_secret,
-            base_url=config.api.base_url
+            base_url=config.api.base_url,
+            timeout=config.api.timeout,
+            retry_attempts=config.api.retry_attempts,
+            retry_delay=config.api.retry_delay,
+            order_rate_limit=config.api.order_rate_limit
         )
 
+        user_stream = book_ticker = None
+        if config.api.use_websocket_streams:
+            user_stream = UserDataStream(api_client, ws_base_url=config.api.ws_base_url)
+            book_ticker = BookTickerStream(api_client, config.trading.symbol, ws_base_url=config.api.ws_base_url)
+
         bot = VolumeTradingBot(
             api_client=api_client,
             calculator=calculator,
@@ -27,27 +76,57 @@ async def main():
             max_close_time_sec=config.volume.max_close_time_sec,
             max_loss_usdt=config.trading.max_loss_usdt,
             min_cycle_delay_sec=config.trading.min_cycle_delay_sec,
-            max_cycle_delay_sec=config.trading.max_cycle_delay_sec
+            max_cycle_delay_sec=config.trading.max_cycle_delay_sec,
+            user_stream=user_stream,
+            book_ticker=book_ticker,
+            seed=config.trading.seed
         )
 
-        await bot.start_volume_trading(
-            config.trading.symbol,
-            config.trading.leverage,
-            config.trading.hedge_mode
-        )
+        async with api_client:
+            try:
+                if user_stream:
+                    await asyncio.gather(user_stream.start(), book_ticker.start())
+                await bot.start_volume_trading(
+                    config.trading.symbol,
+                    config.trading.leverage,
+                    config.trading.hedge_mode
+                )
+            finally:
+                if user_stream:
+                    await asyncio.gather(user_stream.stop(), book_ticker.stop())
 
     elif config.trading.mode == 'dual':
+        from src.bots import DualAccountBot
+
+        # Both accounts talk to the same host, so they share one connection pool and DNS cache
+        connector = AsterApiClient.create_connector()
         api_client1 = AsterApiClient(
             config.api.api_key,
             config.api.api_secret,
-            base_url=config.api.base_url
+            base_url=config.api.base_url,
+            timeout=config.api.timeout,
+            retry_attempts=config.api.retry_attempts,
+            retry_delay=config.api.retry_delay,
+            order_rate_limit=config.api.order_rate_limit,
+            connector=connector
         )
         api_client2 = AsterApiClient(
             config.api.api_key2,
             config.api.api_secret2,
-            base_url=config.api.base_url
+            base_url=config.api.base_url,
+            timeout=config.api.timeout,
+            retry_attempts=config.api.retry_attempts,
+            retry_delay=config.api.retry_delay,
+            order_rate_limit=config.api.order_rate_limit,
+            connector=connector
         )
 
+        user_stream1 = user_stream2 = book_ticker = None
+        if config.api.use_websocket_streams:
+            user_stream1 = UserDataStream(api_client1, ws_base_url=config.api.ws_base_url)
+            user_stream2 = UserDataStream(api_client2, ws_base_url=config.api.ws_base_url)
+            book_ticker = BookTickerStream(api_client1, config.trading.symbol, ws_base_url=config.api.ws_base_url)
+
         bot = DualAccountBot(
             api_client1=api_client1,
             api_client2=api_client2,
@@ -57,18 +136,43 @@ async def main():
             min_cycle_delay_sec=config.trading.min_cycle_delay_sec,
             max_cycle_delay_sec=config.trading.max_cycle_delay_sec,
             min_hold_time_sec=config.dual.min_hold_time_sec,
-            max_hold_time_sec=config.dual.max_hold_time_sec
+            max_hold_time_sec=config.dual.max_hold_time_sec,
+            user_stream1=user_stream1,
+            user_stream2=user_stream2,
+            book_ticker=book_ticker,
+            seed=config.trading.seed
         )
 
-        await bot.start_dual_trading(
-            config.trading.symbol,
-            config.trading.leverage,
-            config.trading.hedge_mode
-        )
+        try:
+            async with api_client1, api_client2:
+                try:
+                    if config.api.use_websocket_streams:
+                        await asyncio.gather(user_stream1.start(), user_stream2.start(), book_ticker.start())
+
+                    await bot.start_dual_trading(
+                        config.trading.symbol,
+                        config.trading.leverage,
+                        config.trading.hedge_mode
+                    )
+                finally:
+                    if config.api.use_websocket_streams:
+                        await asyncio.gather(user_stream1.stop(), user_stream2.stop(), book_ticker.stop())
+        finally:
+            await connector.close()
 
     else:
         raise ValueError(f"Unknown mode: {config.trading.mode}. Use 'volume' or 'dual'")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+    log_listener = setup_logging()
+    try:
+        asyncio.run(main())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        # Positions were closed on the way out; exit non-zero so supervisors see the interruption
+        sys.exit(130)
+    finally:
+        log_listener.stop()
\ No newline at end of file
@@ -1,5 +1,20 @@
-from .base_trading_bot import BaseTradingBot
-from .volume_trading_bot import VolumeTradingBot
-from .dual_account_bot import DualAccountBot
+import importlib
 
-__all__ = ['BaseTradingBot', 'VolumeTradingBot', 'DualAccountBot']
\ No newline at end of file
+# Bot classes are resolved on first access (PEP 562) so only the selected mode's module is imported
+_LAZY_EXPORTS = {
+    'BaseTradingBot': '.base_trading_bot',
+    'PositionInfo': '.base_trading_bot',
+    'OpenedPosition': '.base_trading_bot',
+    'HedgedPositions': '.base_trading_bot',
+    'VolumeTradingBot': '.volume_trading_bot',
+    'DualAccountBot': '.dual_account_bot',
+}
+
+__all__ = ['BaseTradingBot', 'PositionInfo', 'OpenedPosition', 'HedgedPositions',
+           'VolumeTradingBot', 'DualAccountBot']
+
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        return getattr(importlib.import_module(_LAZY_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
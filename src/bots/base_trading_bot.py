@@ -1,192 +1,347 @@
 import asyncio
+import logging
 import random
-from typing import Tuple, Dict, Any
-from src.core.api_client import AsterApiClient
+from dataclasses import dataclass
+from typing import Tuple, Dict, Any, List, Optional
+from src.core.api_client import AsterApiClient, AsterApiError, SymbolInfo, MAX_BATCH_ORDERS
+from src.core.book_ticker_stream import BookTickerStream
+from src.core.user_data_stream import UserDataStream
 from src.utils.position_calculator import PositionCalculator
 
+logger = logging.getLogger(__name__)
+
+# Order side that opens a position on the given position side
+OPEN_ORDER_SIDES = {'LONG': 'BUY', 'SHORT': 'SELL'}
+
+# Backoff bounds for confirming a position mode change, doubling from the first delay
+HEDGE_MODE_POLL_START_SEC = 0.02
+HEDGE_MODE_POLL_MAX_SEC = 0.64
+
+
+@dataclass(frozen=True)
+class PositionInfo:
+    """Open position as reported by positionRisk"""
+    side: str
+    amount: float
+    entry_price: float
+    unrealized_pnl: float
+    margin: float
+
+
+@dataclass(frozen=True)
+class OpenedPosition:
+    """Single position opened by a market order"""
+    quantity: float
+    entry_price: float
+    side: str
+
+
+@dataclass(frozen=True)
+class HedgedPositions:
+    """LONG and SHORT legs opened together on one account"""
+    quantity: float
+    long_price: float
+    short_price: float
+
 
 class BaseTradingBot:
 
-    def __init__(self, api_client: AsterApiClient, calculator: PositionCalculator):
+    def __init__(self, api_client: AsterApiClient, calculator: PositionCalculator,
+                 user_stream: Optional[UserDataStream] = None, seed: Optional[int] = None,
+                 book_ticker: Optional[BookTickerStream] = None, rng: Optional[random.Random] = None):
         self.api_client = api_client
         self.calculator = calculator
+        self.user_stream = user_stream
+        self.book_ticker = book_ticker
+        # Per-bot generator, or the owning bot's one; pass a seed to replay the same order sequence
+        self._rng = rng if rng is not None else random.Random(seed)
+        # Per (symbol, positionSide), the stream position update time that reflects this bot's latest order
+        self._order_times: Dict[Tuple[str, str], int] = {}
 
     async def setup_trading_environment(self, symbol: str, leverage: int, hedge_mode: bool) -> None:
-        if hedge_mode:
-            current_hedge_mode = await self.api_client.check_hedge_mode()
-            if not current_hedge_mode:
-                await self.api_client.set_hedge_mode(True)
-                await asyncio.sleep(0.5)
-        await self.api_client.set_leverage(symbol, leverage)
+        # Leverage is per symbol and independent of the position mode, so both are set concurrently
+        await asyncio.gather(
+            self._ensure_hedge_mode(hedge_mode),
+            self.api_client.set_leverage(symbol, leverage)
+        )
+
+    async def _ensure_hedge_mode(self, hedge_mode: bool) -> None:
+        # Setting the mode is idempotent, so no separate check is needed beforehand
+        if hedge_mode and await self.api_client.set_hedge_mode(True):
+            await self._wait_for_hedge_mode()
+
+    async def _wait_for_hedge_mode(self) -> None:
+        """Poll until the exchange reports hedge mode, backing off instead of sleeping a fixed time"""
+        delay = HEDGE_MODE_POLL_START_SEC
+        while delay <= HEDGE_MODE_POLL_MAX_SEC:
+            await asyncio.sleep(delay)
+            if await self.api_client.check_hedge_mode():
+                return
+            delay *= 2
+        logger.warning("⚠️ Hedge mode change not confirmed yet")
 
     async def get_market_prices(self, symbol: str) -> Tuple[float, float, float]:
-        orderbook = await self.api_client.get_orderbook(symbol)
-        best_bid = float(orderbook['bids'][0][0])
-        best_ask = float(orderbook['asks'][0][0])
+        # Served from the bookTicker stream while it is connected for this symbol
+        prices = self.book_ticker.prices if self.book_ticker and self.book_ticker.symbol == symbol else None
+        if prices:
+            best_bid, best_ask = prices
+        else:
+            # Top of book only; the depth endpoint would ship levels that are never read
+            ticker = await self.api_client.get_book_ticker(symbol)
+            best_bid = float(ticker['bidPrice'])
+            best_ask = float(ticker['askPrice'])
         mid_price = (best_bid + best_ask) / 2
         return best_bid, best_ask, mid_price
 
-    async def open_hedged_positions(self, symbol: str, leverage: int) -> Dict[str, Any]:
-        usdt_balance = await self.get_usdt_balance()
+    async def _fetch_order_inputs(self, symbol: str) -> Tuple[float, SymbolInfo, float]:
+        """Fetch balance, symbol filters and mid price concurrently for position sizing"""
+        usdt_balance, symbol_info, (best_bid, best_ask, mid_price) = await asyncio.gather(
+            self.get_usdt_balance(),
+            self.api_client.get_symbol_info(symbol),
+            self.get_market_prices(symbol)
+        )
+
         if usdt_balance == 0:
             raise Exception("No USDT balance available")
 
-        symbol_info = await self.api_client.get_symbol_info(symbol)
         if not symbol_info:
             raise Exception(f"Failed to get symbol info for {symbol}")
 
-        best_bid, best_ask, mid_price = await self.get_market_prices(symbol)
+        return usdt_balance, symbol_info, mid_price
+
+    async def open_hedged_positions(self, symbol: str, leverage: int) -> HedgedPositions:
+        usdt_balance, symbol_info, mid_price = await self._fetch_order_inputs(symbol)
         quantity = self.calculator.calculate_position_size(
             symbol_info, mid_price, usdt_balance, leverage
         )
 
         try:
-            open_long_first = random.choice([True, False])
+            # Both legs go out in one request; the random order only decides which one is listed first
+            open_long_first = self._rng.random() < 0.5
+            long_leg = (OPEN_ORDER_SIDES['LONG'], "LONG", quantity)
+            short_leg = (OPEN_ORDER_SIDES['SHORT'], "SHORT", quantity)
 
             if open_long_first:
-                long_result = await self.api_client.place_order(
-                    symbol=symbol,
-                    side="BUY",
-                    position_side="LONG",
-                    order_type="MARKET",
-                    quantity=quantity
-                )
-                long_price = float(long_result.get('avgPrice', mid_price))
-
-                short_result = await self.api_client.place_order(
-                    symbol=symbol,
-                    side="SELL",
-                    position_side="SHORT",
-                    order_type="MARKET",
-                    quantity=quantity
-                )
-                short_price = float(short_result.get('avgPrice', mid_price))
-
-                print(f"✅ Opened: LONG {quantity} @ {long_price:.4f} "
-                      f"→ SHORT {quantity} @ {short_price:.4f} | {symbol}")
+                long_result, short_result = await self._place_market_orders(symbol, [long_leg, short_leg])
             else:
-                short_result = await self.api_client.place_order(
-                    symbol=symbol,
-                    side="SELL",
-                    position_side="SHORT",
-                    order_type="MARKET",
-                    quantity=quantity
-                )
-                short_price = float(short_result.get('avgPrice', mid_price))
-
-                long_result = await self.api_client.place_order(
-                    symbol=symbol,
-                    side="BUY",
-                    position_side="LONG",
-                    order_type="MARKET",
-                    quantity=quantity
-                )
-                long_price = float(long_result.get('avgPrice', mid_price))
+                short_result, long_result = await self._place_market_orders(symbol, [short_leg, long_leg])
 
-                print(f"✅ Opened: SHORT {quantity} @ {short_price:.4f} "
-                      f"→ LONG {quantity} @ {long_price:.4f} | {symbol}")
+            # Wait for both legs before raising so the cleanup below sees the filled one
+            for result in (long_result, short_result):
+                if isinstance(result, Exception):
+                    raise result
+
+            long_price = float(long_result.get('avgPrice', mid_price))
+            short_price = float(short_result.get('avgPrice', mid_price))
+
+            if open_long_first:
+                logger.info(f"✅ Opened: LONG {quantity} @ {long_price:.4f} "
+                            f"→ SHORT {quantity} @ {short_price:.4f} | {symbol}")
+            else:
+                logger.info(f"✅ Opened: SHORT {quantity} @ {short_price:.4f} "
+                            f"→ LONG {quantity} @ {long_price:.4f} | {symbol}")
 
-            return {'quantity': quantity, 'long_price': long_price, 'short_price': short_price}
+            return HedgedPositions(quantity, long_price, short_price)
 
         except Exception as e:
-            print(f"❌ Error opening positions: {e}")
+            logger.error(f"❌ Error opening positions: {e}")
             await self.close_positions(symbol, silent=True)
             raise
 
-    async def open_single_position(self, symbol: str, side: str, leverage: int) -> Dict[str, Any]:
-        usdt_balance = await self.get_usdt_balance()
-        if usdt_balance == 0:
-            raise Exception("No USDT balance available")
+    async def _place_market_orders(self, symbol: str, legs: List[Tuple[str, str, float]]) -> List[Any]:
+        """Place (side, position_side, quantity) market orders; failed legs are returned as exceptions"""
+        try:
+            results = await self._send_market_orders(symbol, legs)
+        except BaseException:
+            # None of the legs is known to have executed or not
+            for _, position_side, _ in legs:
+                self._mark_order_outcome_unknown((symbol, position_side))
+            raise
 
-        symbol_info = await self.api_client.get_symbol_info(symbol)
-        if not symbol_info:
-            raise Exception(f"Failed to get symbol info for {symbol}")
+        for (_, position_side, _), result in zip(legs, results):
+            key = (symbol, position_side)
+            if isinstance(result, AsterApiError) and result.status < 500:
+                continue
+            if isinstance(result, Exception):
+                self._mark_order_outcome_unknown(key)
+            else:
+                # The fill's ACCOUNT_UPDATE is stamped no earlier than the order's updateTime
+                self._order_times[key] = max(self._order_times.get(key, 0), result.get('updateTime', 0))
+        return results
 
-        best_bid, best_ask, mid_price = await self.get_market_prices(symbol)
+    def _mark_order_outcome_unknown(self, key: Tuple[str, str]) -> None:
+        """Require a stream update newer than the current one before trusting this leg's cached position"""
+        cached = self.user_stream.positions.get(key) if self.user_stream else None
+        newer_than = cached['update_time'] + 1 if cached else 1
+        self._order_times[key] = max(self._order_times.get(key, 0), newer_than)
+
+    async def _send_market_orders(self, symbol: str, legs: List[Tuple[str, str, float]]) -> List[Any]:
+        if 1 < len(legs) <= MAX_BATCH_ORDERS:
+            orders = [
+                {"symbol": symbol, "side": side, "positionSide": position_side,
+                 "type": "MARKET", "quantity": quantity}
+                for side, position_side, quantity in legs
+            ]
+            try:
+                return await self.api_client.place_batch_orders(orders)
+            except AsterApiError as e:
+                # A 5xx batch may have executed, so only a definite rejection falls back to single orders
+                if e.status >= 500:
+                    raise
+                logger.warning(f"⚠️ Batch order rejected ({e}) - Placing orders individually")
+
+        return await asyncio.gather(
+            *(self.api_client.place_order(
+                symbol=symbol,
+                side=side,
+                position_side=position_side,
+                order_type="MARKET",
+                quantity=quantity
+            ) for side, position_side, quantity in legs),
+            return_exceptions=True
+        )
+
+    async def place_market_order(self, symbol: str, side: str, position_side: str,
+                                 quantity: float) -> Dict[str, Any]:
+        """Place one market order, raising if it is rejected"""
+        result, = await self._place_market_orders(symbol, [(side, position_side, quantity)])
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def open_single_position(self, symbol: str, side: str, leverage: int) -> OpenedPosition:
+        usdt_balance, symbol_info, mid_price = await self._fetch_order_inputs(symbol)
         quantity = self.calculator.calculate_position_size(
             symbol_info, mid_price, usdt_balance, leverage
         )
 
         try:
-            if side == "LONG":
-                result = await self.api_client.place_order(
-                    symbol=symbol,
-                    side="BUY",
-                    position_side="LONG",
-                    order_type="MARKET",
-                    quantity=quantity
-                )
-                entry_price = float(result.get('avgPrice', mid_price))
-                print(f"✅ Opened: LONG {quantity} @ {entry_price:.4f} | {symbol}")
-            else:
-                result = await self.api_client.place_order(
-                    symbol=symbol,
-                    side="SELL",
-                    position_side="SHORT",
-                    order_type="MARKET",
-                    quantity=quantity
-                )
-                entry_price = float(result.get('avgPrice', mid_price))
-                print(f"✅ Opened: SHORT {quantity} @ {entry_price:.4f} | {symbol}")
+            result = await self.place_market_order(symbol, OPEN_ORDER_SIDES[side], side, quantity)
+            entry_price = float(result.get('avgPrice', mid_price))
+            logger.info(f"✅ Opened: {side} {quantity} @ {entry_price:.4f} | {symbol}")
 
-            return {'quantity': quantity, 'entry_price': entry_price, 'side': side}
+            return OpenedPosition(quantity, entry_price, side)
 
         except Exception as e:
-            print(f"❌ Error opening {side} position: {e}")
+            logger.error(f"❌ Error opening {side} position: {e}")
             await self.close_positions(symbol, silent=True)
             raise
 
     async def check_positions_status(self, symbol: str) -> Dict[str, Any]:
         positions = await self.api_client.get_position_risk(symbol)
-        total_pnl = 0.0
-
-        for pos in positions:
-            if isinstance(pos, dict) and float(pos.get('positionAmt', 0)) != 0:
-                pnl = float(pos.get('unRealizedProfit', 0))
-                total_pnl += pnl
+        total_pnl = sum(
+            float(pos.get('unRealizedProfit', 0)) for pos in positions
+            if isinstance(pos, dict) and float(pos.get('positionAmt', 0)) != 0
+        )
 
         return {"total_pnl": total_pnl}
 
-    async def get_position_details(self, symbol: str) -> list:
+    async def get_position_details(self, symbol: str) -> List[PositionInfo]:
         positions = await self.api_client.get_position_risk(symbol)
         active_positions = []
 
         for pos in positions:
-            if isinstance(pos, dict) and float(pos.get('positionAmt', 0)) != 0:
-                active_positions.append({
-                    'side': pos.get('positionSide'),
-                    'amount': float(pos.get('positionAmt', 0)),
-                    'entry_price': float(pos.get('entryPrice', 0)),
-                    'unrealized_pnl': float(pos.get('unRealizedProfit', 0)),
-                    'margin': float(pos.get('isolatedWallet', 0)) or float(pos.get('initialMargin', 0))
-                })
+            if not isinstance(pos, dict):
+                continue
+            pos_amt = float(pos.get('positionAmt', 0))
+            if pos_amt == 0:
+                continue
+            isolated_wallet = float(pos.get('isolatedWallet', 0))
+            active_positions.append(PositionInfo(
+                side=pos.get('positionSide'),
+                amount=pos_amt,
+                entry_price=float(pos.get('entryPrice', 0)),
+                unrealized_pnl=float(pos.get('unRealizedProfit', 0)),
+                margin=isolated_wallet or float(pos.get('initialMargin', 0))
+            ))
 
         return active_positions
 
+    def _stream_positions_current(self, symbol: str) -> bool:
+        """Whether the stream has applied a position update for every leg this bot has ordered on the symbol"""
+        stream = self.user_stream
+        if not (stream and stream.connected and stream.positions_synced):
+            return False
+        return all(
+            stream.positions.get(key, {}).get('update_time', 0) >= order_time
+            for key, order_time in self._order_times.items() if key[0] == symbol
+        )
+
     async def get_usdt_balance(self) -> float:
+        # Always REST: the stream only carries wallet balances, not the available balance sizing relies on
         balances = await self.api_client.get_account_balance()
-        for balance in balances:
-            if isinstance(balance, dict) and balance.get('asset') == 'USDT':
-                return float(balance.get('availableBalance', 0))
-        return 0.0
+        return float(balances.get('USDT', {}).get('availableBalance', 0))
+
+    async def _get_open_position_amounts(self, symbol: str) -> List[Tuple[str, float]]:
+        """(positionSide, positionAmt) of every open position, from the stream once it reflects every leg ordered"""
+        if self._stream_positions_current(symbol):
+            return [
+                (position_side, pos['amount'])
+                for (pos_symbol, position_side), pos in self.user_stream.positions.items()
+                if pos_symbol == symbol and pos['amount'] != 0
+            ]
+
+        positions = await self.api_client.get_position_risk(symbol)
+        return [
+            (pos.get('positionSide'), float(pos.get('positionAmt', 0)))
+            for pos in positions
+            if isinstance(pos, dict) and float(pos.get('positionAmt', 0)) != 0
+        ]
 
-    async def close_positions(self, symbol: str, silent: bool = False) -> None:
+    async def close_positions(self, symbol: str, silent: bool = False) -> List[Dict[str, Any]]:
+        """Market-close every open position; returns the close orders that were accepted"""
         try:
-            positions = await self.api_client.get_position_risk(symbol)
-
-            for pos in positions:
-                if isinstance(pos, dict):
-                    pos_amt = float(pos.get('positionAmt', 0))
-                    if pos_amt != 0:
-                        close_side = "SELL" if pos_amt > 0 else "BUY"
-                        await self.api_client.place_order(
-                            symbol=symbol,
-                            side=close_side,
-                            position_side=pos.get('positionSide'),
-                            order_type="MARKET",
-                            quantity=abs(pos_amt)
-                        )
-            if not silent:
-                print("✓ Positions closed")
+            open_positions = await self._get_open_position_amounts(symbol)
         except Exception as e:
-            print(f"❌ Error closing positions: {e}")
\ No newline at end of file
+            logger.error(f"❌ Error closing positions: {e}")
+            return []
+
+        legs = [
+            ("SELL" if pos_amt > 0 else "BUY", position_side, abs(pos_amt))
+            for position_side, pos_amt in open_positions
+        ]
+
+        # Every leg is attempted even if another fails, so nothing is left open because of one error
+        try:
+            results = await self._place_market_orders(symbol, legs)
+        except Exception as e:
+            logger.error(f"❌ Error closing positions: {e}")
+            return []
+
+        orders = []
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"❌ Error closing positions: {result}")
+            else:
+                orders.append(result)
+
+        if not silent and len(orders) == len(results):
+            logger.info("✓ Positions closed")
+
+        return orders
+
+    async def wait_for_fills(self, symbol: str, orders: List[Dict[str, Any]],
+                             timeout: float = 2.0, poll_interval: float = 0.2) -> bool:
+        """Wait until all orders are FILLED; returns False if that is not confirmed within timeout"""
+        pending = [order['orderId'] for order in orders if order.get('status') != 'FILLED']
+        now = asyncio.get_running_loop().time
+        deadline = now() + timeout
+
+        # Fills are pushed by the stream; REST polling covers whatever remains after a disconnect
+        if pending and self.user_stream and self.user_stream.connected:
+            pending = await self.user_stream.wait_for_fills(pending, timeout)
+
+        try:
+            while pending:
+                if now() >= deadline:
+                    return False
+                await asyncio.sleep(poll_interval)
+                results = await asyncio.gather(
+                    *(self.api_client.get_order(symbol, order_id) for order_id in pending)
+                )
+                pending = [order['orderId'] for order in results if order.get('status') != 'FILLED']
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to confirm order fills: {e}")
+            return False
+
+        return True
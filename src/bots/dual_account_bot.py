@@ -1,9 +1,26 @@
 import asyncio
+import logging
+import math
 import random
-from typing import Dict, Any, Tuple
-from src.core.api_client import AsterApiClient
+from itertools import chain
+from typing import Dict, Any, List, Tuple, Optional
+from src.core.api_client import AsterApiClient, AsterApiError, SYMBOL_FILTER_ERROR_CODES
+from src.core.book_ticker_stream import BookTickerStream
+from src.core.user_data_stream import UserDataStream
 from src.utils.position_calculator import PositionCalculator
-from src.bots.base_trading_bot import BaseTradingBot
+from src.bots.base_trading_bot import BaseTradingBot, PositionInfo, OpenedPosition, OPEN_ORDER_SIDES
+
+# Position polling interval bounds; the interval grows by one second
+# for every DEVIATION_HEADROOM_PER_SEC percent left before the deviation limit
+MIN_CHECK_INTERVAL_SEC = 1
+MAX_CHECK_INTERVAL_SEC = 5
+DEVIATION_HEADROOM_PER_SEC = 5
+# Close early once realized plus open losses use this share of max_loss_usdt
+LOSS_GUARD_RATIO = 0.9
+# Warn when a position check starts this many seconds later than scheduled
+MONITOR_LAG_WARNING_SEC = 1
+
+logger = logging.getLogger(__name__)
 
 
 class DualAccountBot:
@@ -12,9 +29,12 @@ class DualAccountBot:
                  calculator: PositionCalculator, max_position_deviation_percent: float = 20,
                  max_loss_usdt: float = 100, min_cycle_delay_sec: int = 5,
                  max_cycle_delay_sec: int = 15, min_hold_time_sec: int = 30,
-                 max_hold_time_sec: int = 300):
-        self.bot1 = BaseTradingBot(api_client1, calculator)
-        self.bot2 = BaseTradingBot(api_client2, calculator)
+                 max_hold_time_sec: int = 300, user_stream1: Optional[UserDataStream] = None,
+                 user_stream2: Optional[UserDataStream] = None, seed: Optional[int] = None,
+                 book_ticker: Optional[BookTickerStream] = None):
+        # Market data is public, so both accounts read prices from the same bookTicker stream
+        self.bot1 = BaseTradingBot(api_client1, calculator, user_stream1, book_ticker=book_ticker)
+        self.bot2 = BaseTradingBot(api_client2, calculator, user_stream2, book_ticker=book_ticker)
         self.calculator = calculator
         self.max_position_deviation_percent = max_position_deviation_percent
         self.max_loss_usdt = max_loss_usdt
@@ -26,54 +46,51 @@ class DualAccountBot:
         self.cycles_completed = 0
         self.account1_pnl = 0.0
         self.account2_pnl = 0.0
+        # Per-bot generator for sides, hold times and delays; pass a seed to replay a session
+        self._rng = random.Random(seed)
+        # Set by either account's stream so monitoring re-checks as soon as an account changes
+        self._account_updated = asyncio.Event()
+        for user_stream in (user_stream1, user_stream2):
+            if user_stream:
+                user_stream.add_listener(self._account_updated.set)
 
     async def setup_both_accounts(self, symbol: str, leverage: int, hedge_mode: bool):
+        # Symbol filters are loaded alongside so the first cycle's sizing hits the client cache
         await asyncio.gather(
             self.bot1.setup_trading_environment(symbol, leverage, hedge_mode),
-            self.bot2.setup_trading_environment(symbol, leverage, hedge_mode)
+            self.bot2.setup_trading_environment(symbol, leverage, hedge_mode),
+            self.bot1.api_client.get_symbol_info(symbol)
         )
 
     @staticmethod
     async def _open_market_position(bot: BaseTradingBot, symbol: str,
                                     position_side: str, quantity: float,
-                                    account_name: str) -> Dict[str, Any]:
+                                    account_name: str) -> OpenedPosition:
         """Helper method to open a market position"""
-        side = "BUY" if position_side == "LONG" else "SELL"
-
-        result = await bot.api_client.place_order(
-            symbol=symbol,
-            side=side,
-            position_side=position_side,
-            order_type="MARKET",
-            quantity=quantity
-        )
+        result = await bot.place_market_order(symbol, OPEN_ORDER_SIDES[position_side], position_side, quantity)
 
         entry_price = float(result.get('avgPrice', 0))
-        print(f"✅ {account_name}: {position_side} {quantity} @ {entry_price:.4f} | {symbol}")
+        logger.info(f"✅ {account_name}: {position_side} {quantity} @ {entry_price:.4f} | {symbol}")
 
-        return {
-            'quantity': quantity,
-            'entry_price': entry_price,
-            'side': position_side
-        }
+        return OpenedPosition(quantity, entry_price, position_side)
 
-    async def open_opposite_positions(self, symbol: str, leverage: int) -> Tuple[Dict, Dict]:
-        # Get balances from both accounts
-        balance1 = await self.bot1.get_usdt_balance()
-        balance2 = await self.bot2.get_usdt_balance()
+    async def open_opposite_positions(self, symbol: str, leverage: int) -> Tuple[OpenedPosition, OpenedPosition]:
+        # Get balances from both accounts, symbol info and market prices in one round-trip
+        balance1, balance2, symbol_info, (best_bid, best_ask, mid_price) = await asyncio.gather(
+            self.bot1.get_usdt_balance(),
+            self.bot2.get_usdt_balance(),
+            self.bot1.api_client.get_symbol_info(symbol),
+            self.bot1.get_market_prices(symbol)
+        )
 
         # Use minimum balance for position sizing
         min_balance = min(balance1, balance2)
-        print(f"💰 Account 1: {balance1:.2f} USDT | Account 2: {balance2:.2f} USDT")
-        print(f"📊 Using minimum balance: {min_balance:.2f} USDT for equal position sizing")
+        logger.info(f"💰 Account 1: {balance1:.2f} USDT | Account 2: {balance2:.2f} USDT")
+        logger.info(f"📊 Using minimum balance: {min_balance:.2f} USDT for equal position sizing")
 
-        # Get symbol info and market prices
-        symbol_info = await self.bot1.api_client.get_symbol_info(symbol)
         if not symbol_info:
             raise Exception(f"Failed to get symbol info for {symbol}")
 
-        best_bid, best_ask, mid_price = await self.bot1.get_market_prices(symbol)
-
         # Calculate position size based on minimum balance
         # Use single_position=True since each account opens only one position
         quantity = self.calculator.calculate_position_size(
@@ -81,134 +98,198 @@ class DualAccountBot:
         )
 
         # Randomly decide which account gets LONG and which gets SHORT
-        long_on_first = random.choice([True, False])
+        long_on_first = self._rng.random() < 0.5
 
         try:
             if long_on_first:
                 # Account 1: LONG, Account 2: SHORT
-                position1_info = await self._open_market_position(
-                    self.bot1, symbol, "LONG", quantity, "Account 1"
-                )
-                position2_info = await self._open_market_position(
-                    self.bot2, symbol, "SHORT", quantity, "Account 2"
-                )
+                side1, side2 = "LONG", "SHORT"
             else:
                 # Account 1: SHORT, Account 2: LONG
-                position1_info = await self._open_market_position(
-                    self.bot1, symbol, "SHORT", quantity, "Account 1"
-                )
-                position2_info = await self._open_market_position(
-                    self.bot2, symbol, "LONG", quantity, "Account 2"
-                )
+                side1, side2 = "SHORT", "LONG"
+
+            legs = [(self.bot1, side1, "Account 1"), (self.bot2, side2, "Account 2")]
+
+            # Both accounts' orders are submitted together to keep the legs' fills close in time
+            results = await asyncio.gather(
+                *(self._open_market_position(bot, symbol, side, quantity, name) for bot, side, name in legs),
+                return_exceptions=True
+            )
+
+            # A leg the exchange rejected was never filled, so resend it once before unwinding the other
+            failed = [i for i, result in enumerate(results) if isinstance(result, Exception)]
+            if len(failed) == 1 and self._is_retryable_rejection(results[failed[0]]):
+                bot, side, name = legs[failed[0]]
+                logger.warning(f"⚠️ {name} {side} rejected ({results[failed[0]]}) - Retrying once")
+                results[failed[0]] = await self._open_market_position(bot, symbol, side, quantity, name)
+
+            # Wait for both legs before raising so the cleanup below sees the filled one
+            for result in results:
+                if isinstance(result, Exception):
+                    raise result
+            position1_info, position2_info = results
 
             margin_per_position = (quantity * mid_price) / leverage
-            print(f"💼 Margin per position: {margin_per_position:.2f} USDT")
+            logger.info(f"💼 Margin per position: {margin_per_position:.2f} USDT")
 
             return position1_info, position2_info
 
         except Exception as e:
-            print(f"❌ Error opening opposite positions: {e}")
+            logger.error(f"❌ Error opening opposite positions: {e}")
             await self.close_all_positions(symbol)
             raise
 
     @staticmethod
-    async def calculate_position_deviation(position: Dict, initial_margin: float) -> float:
-        if initial_margin == 0:
-            return 0
-        pnl = position.get('unrealized_pnl', 0)
-        return abs(pnl / initial_margin) * 100
-
-    async def _check_deviation(self, positions: list, position_info: Dict,
-                              initial_margin: float, account_name: str) -> bool:
-        """Check if position deviation exceeds threshold"""
+    def _is_retryable_rejection(error: Exception) -> bool:
+        """True for 4xx rejections, which guarantee no fill, unless resending the same order must fail"""
+        return (isinstance(error, AsterApiError) and error.status < 500
+                and error.code not in SYMBOL_FILTER_ERROR_CODES)
+
+    @staticmethod
+    def _get_deviation(positions: List[PositionInfo], position_info: OpenedPosition,
+                       inv_margin: float) -> float:
+        """Get the largest deviation of the tracked position side in percent (inv_margin = 100 / margin)"""
+        side = position_info.side
+        deviation = 0.0
         for pos in positions:
-            if pos['side'] == position_info['side']:
-                deviation = await self.calculate_position_deviation(pos, initial_margin)
-                if deviation >= self.max_position_deviation_percent:
-                    print(f"⚠️ {account_name} deviation: {deviation:.2f}% - Closing positions")
-                    return True
+            if pos.side == side:
+                deviation = max(deviation, abs(pos.unrealized_pnl) * inv_margin)
+        return deviation
+
+    def _check_deviation(self, deviation: float, account_name: str) -> bool:
+        """Check if position deviation exceeds threshold"""
+        if deviation >= self.max_position_deviation_percent:
+            logger.warning(f"⚠️ {account_name} deviation: {deviation:.2f}% - Closing positions")
+            return True
         return False
 
-    async def monitor_positions(self, symbol: str, position1_info: Dict,
-                               position2_info: Dict, leverage: int) -> bool:
-        check_interval = 1
-        hold_time = random.randint(self.min_hold_time_sec, self.max_hold_time_sec)
-        start_time = asyncio.get_event_loop().time()
+    def _get_check_interval(self, deviation: float) -> int:
+        """Poll less often while the deviation is far from the closing threshold"""
+        headroom = self.max_position_deviation_percent - deviation
+        return max(MIN_CHECK_INTERVAL_SEC,
+                   min(MAX_CHECK_INTERVAL_SEC, int(headroom / DEVIATION_HEADROOM_PER_SEC)))
+
+    async def monitor_positions(self, symbol: str, position1_info: OpenedPosition,
+                               position2_info: OpenedPosition, leverage: int) -> bool:
+        hold_time = self._rng.randint(self.min_hold_time_sec, self.max_hold_time_sec)
+        now = asyncio.get_running_loop().time
+        start_time = now()
 
-        # Calculate margins
-        position1_margin = position1_info['quantity'] * position1_info['entry_price'] / leverage
-        position2_margin = position2_info['quantity'] * position2_info['entry_price'] / leverage
+        # Calculate margins once, as percent-scaled reciprocals for the per-poll deviation checks
+        position1_margin = position1_info.quantity * position1_info.entry_price / leverage
+        position2_margin = position2_info.quantity * position2_info.entry_price / leverage
+        inv_margin1 = 100.0 / position1_margin if position1_margin else 0.0
+        inv_margin2 = 100.0 / position2_margin if position2_margin else 0.0
+
+        # Updates from opening the legs are already reflected in the first poll
+        self._account_updated.clear()
+        next_check = start_time
 
         while True:
-            elapsed = asyncio.get_event_loop().time() - start_time
-            positions1 = await self.bot1.get_position_details(symbol)
-            positions2 = await self.bot2.get_position_details(symbol)
+            elapsed = now() - start_time
+            positions1, positions2 = await asyncio.gather(
+                self.bot1.get_position_details(symbol),
+                self.bot2.get_position_details(symbol)
+            )
 
             if not positions1 or not positions2:
                 return True
 
             # Check deviations for both accounts
-            if await self._check_deviation(positions1, position1_info, position1_margin, "Account 1"):
+            deviation1 = self._get_deviation(positions1, position1_info, inv_margin1)
+            if self._check_deviation(deviation1, "Account 1"):
                 return True
 
-            if await self._check_deviation(positions2, position2_info, position2_margin, "Account 2"):
+            deviation2 = self._get_deviation(positions2, position2_info, inv_margin2)
+            if self._check_deviation(deviation2, "Account 2"):
+                return True
+
+            combined_pnl = math.fsum(p.unrealized_pnl for p in chain(positions1, positions2))
+
+            if self.total_pnl + combined_pnl <= -self.max_loss_usdt * LOSS_GUARD_RATIO:
+                logger.warning(f"⚠️ Open loss {combined_pnl:.4f} USDT nears max loss - Closing positions")
                 return True
 
             # Check combined PnL only after minimum hold time
             if elapsed >= self.min_hold_time_sec:
-                combined_pnl = sum(p['unrealized_pnl'] for p in positions1) + \
-                              sum(p['unrealized_pnl'] for p in positions2)
-
                 if combined_pnl > 0:
-                    print(f"✅ Positive PnL detected: {combined_pnl:.4f} USDT (after {elapsed:.0f}s) - Closing positions")
+                    logger.info(f"✅ Positive PnL detected: {combined_pnl:.4f} USDT (after {elapsed:.0f}s) - Closing positions")
                     return True
 
             if elapsed >= hold_time:
-                print(f"⏱️ Hold time reached ({hold_time}s) - Closing positions")
+                logger.info(f"⏱️ Hold time reached ({hold_time}s) - Closing positions")
                 return True
 
-            await asyncio.sleep(check_interval)
+            # Checks run on a fixed schedule so slow polls do not push later ones back
+            next_check += self._get_check_interval(max(deviation1, deviation2))
+            current_time = now()
+            if current_time - next_check > MONITOR_LAG_WARNING_SEC:
+                logger.warning(f"⚠️ Position check {current_time - next_check:.2f}s behind schedule")
+            next_check = max(next_check, current_time)
 
-    async def close_all_positions(self, symbol: str):
-        await asyncio.gather(
+            # Never sleep past the hold time deadline
+            await self._wait_for_next_check(min(next_check, start_time + hold_time) - current_time)
+
+    async def _wait_for_next_check(self, interval: float) -> None:
+        """Sleep for the check interval, waking early when a stream reports an account change"""
+        try:
+            await asyncio.wait_for(self._account_updated.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+        self._account_updated.clear()
+
+    async def close_all_positions(self, symbol: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        orders1, orders2 = await asyncio.gather(
             self.bot1.close_positions(symbol, silent=True),
             self.bot2.close_positions(symbol, silent=True)
         )
-        print("✓ All positions closed on both accounts")
+        logger.info("✓ All positions closed on both accounts")
+        return orders1, orders2
 
     def _print_cycle_result(self, cycle_pnl: float, account1_cycle_pnl: float,
                            account2_cycle_pnl: float):
         """Print cycle result with proper formatting"""
         status = "✅ Profit" if cycle_pnl >= 0 else "❌ Loss"
-        print(f"{status}: Cycle #{self.cycles_completed}")
-        print(f"   Account 1: {account1_cycle_pnl:.4f} USDT | Account 2: {account2_cycle_pnl:.4f} USDT")
+        logger.info(f"{status}: Cycle #{self.cycles_completed}")
+        logger.info(f"   Account 1: {account1_cycle_pnl:.4f} USDT | Account 2: {account2_cycle_pnl:.4f} USDT")
 
         if cycle_pnl >= 0:
-            print(f"   Combined Profit: {cycle_pnl:.4f} USDT | Total PnL: {self.total_pnl:.4f} USDT")
+            logger.info(f"   Combined Profit: {cycle_pnl:.4f} USDT | Total PnL: {self.total_pnl:.4f} USDT")
         else:
-            print(f"   Combined Loss: {abs(cycle_pnl):.4f} USDT | Total PnL: {self.total_pnl:.4f} USDT")
+            logger.info(f"   Combined Loss: {abs(cycle_pnl):.4f} USDT | Total PnL: {self.total_pnl:.4f} USDT")
+
+    def _loss_limit_reached(self) -> bool:
+        """Whether to stop trading; past the loss guard every new cycle would close on its first check"""
+        return (abs(self.total_pnl) >= self.max_loss_usdt
+                or self.total_pnl <= -self.max_loss_usdt * LOSS_GUARD_RATIO)
 
     async def run_dual_trading_cycle(self, symbol: str, leverage: int) -> bool:
-        if abs(self.total_pnl) >= self.max_loss_usdt:
+        if self._loss_limit_reached():
             return False
 
         try:
-            balance1_before = await self.bot1.get_usdt_balance()
-            balance2_before = await self.bot2.get_usdt_balance()
+            balance1_before, balance2_before = await asyncio.gather(
+                self.bot1.get_usdt_balance(),
+                self.bot2.get_usdt_balance()
+            )
 
             position1_info, position2_info = await self.open_opposite_positions(symbol, leverage)
 
-            monitoring_task = asyncio.create_task(
-                self.monitor_positions(symbol, position1_info, position2_info, leverage)
-            )
-
-            await monitoring_task
+            await self.monitor_positions(symbol, position1_info, position2_info, leverage)
 
-            await self.close_all_positions(symbol)
-            await asyncio.sleep(1)
+            # Read balances as soon as both accounts' close orders are confirmed filled
+            orders1, orders2 = await self.close_all_positions(symbol)
+            filled1, filled2 = await asyncio.gather(
+                self.bot1.wait_for_fills(symbol, orders1),
+                self.bot2.wait_for_fills(symbol, orders2)
+            )
+            if not (filled1 and filled2):
+                logger.warning("⚠️ Close fills not confirmed - cycle PnL may be inaccurate")
 
-            balance1_after = await self.bot1.get_usdt_balance()
-            balance2_after = await self.bot2.get_usdt_balance()
+            balance1_after, balance2_after = await asyncio.gather(
+                self.bot1.get_usdt_balance(),
+                self.bot2.get_usdt_balance()
+            )
 
             account1_cycle_pnl = balance1_after - balance1_before
             account2_cycle_pnl = balance2_after - balance2_before
@@ -221,25 +302,25 @@ class DualAccountBot:
 
             self._print_cycle_result(cycle_pnl, account1_cycle_pnl, account2_cycle_pnl)
 
-            if abs(self.total_pnl) >= self.max_loss_usdt:
+            if self._loss_limit_reached():
                 return False
 
-            delay = random.randint(self.min_cycle_delay_sec, self.max_cycle_delay_sec)
-            print(f"⏳ Waiting {delay} seconds before next cycle...")
+            delay = self._rng.randint(self.min_cycle_delay_sec, self.max_cycle_delay_sec)
+            logger.info(f"⏳ Waiting {delay} seconds before next cycle...")
             await asyncio.sleep(delay)
 
             return True
 
         except Exception as e:
-            print(f"\n❌ Error in dual trading cycle: {e}")
+            logger.error(f"\n❌ Error in dual trading cycle: {e}")
             await self.close_all_positions(symbol)
             return False
 
     async def start_dual_trading(self, symbol: str, leverage: int, hedge_mode: bool = False):
-        print(f"\n▶️ Dual Account Trading: {symbol} | Leverage: {leverage}x")
-        print(f"Max Deviation: {self.max_position_deviation_percent}% | Max Loss: {self.max_loss_usdt} USDT")
-        print(f"Hold time: {self.min_hold_time_sec}-{self.max_hold_time_sec}s")
-        print(f"Delay between cycles: {self.min_cycle_delay_sec}-{self.max_cycle_delay_sec}s\n")
+        logger.info(f"\n▶️ Dual Account Trading: {symbol} | Leverage: {leverage}x")
+        logger.info(f"Max Deviation: {self.max_position_deviation_percent}% | Max Loss: {self.max_loss_usdt} USDT")
+        logger.info(f"Hold time: {self.min_hold_time_sec}-{self.max_hold_time_sec}s")
+        logger.info(f"Delay between cycles: {self.min_cycle_delay_sec}-{self.max_cycle_delay_sec}s\n")
 
         await self.setup_both_accounts(symbol, leverage, hedge_mode)
 
@@ -247,21 +328,23 @@ class DualAccountBot:
             while True:
                 should_continue = await self.run_dual_trading_cycle(symbol, leverage)
                 if not should_continue:
-                    print(f"\n⏹️ Stopped | Cycles: {self.cycles_completed}")
-                    print(f"Account 1 PnL: {self.account1_pnl:.4f} USDT")
-                    print(f"Account 2 PnL: {self.account2_pnl:.4f} USDT")
-                    print(f"Total PnL: {self.total_pnl:.4f} USDT")
+                    logger.info(f"\n⏹️ Stopped | Cycles: {self.cycles_completed}")
+                    logger.info(f"Account 1 PnL: {self.account1_pnl:.4f} USDT")
+                    logger.info(f"Account 2 PnL: {self.account2_pnl:.4f} USDT")
+                    logger.info(f"Total PnL: {self.total_pnl:.4f} USDT")
                     break
 
-        except KeyboardInterrupt:
-            print(f"\n\n⚠️ Interrupted - Closing all positions...")
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            logger.warning(f"\n\n⚠️ Interrupted - Closing all positions...")
             await self.close_all_positions(symbol)
-            print(f"Final Stats:")
-            print(f"Cycles: {self.cycles_completed}")
-            print(f"Account 1 PnL: {self.account1_pnl:.4f} USDT")
-            print(f"Account 2 PnL: {self.account2_pnl:.4f} USDT")
-            print(f"Total PnL: {self.total_pnl:.4f} USDT")
+            logger.info(f"Final Stats:")
+            logger.info(f"Cycles: {self.cycles_completed}")
+            logger.info(f"Account 1 PnL: {self.account1_pnl:.4f} USDT")
+            logger.info(f"Account 2 PnL: {self.account2_pnl:.4f} USDT")
+            logger.info(f"Total PnL: {self.total_pnl:.4f} USDT")
+            # Let the caller finish the cancellation instead of returning as if trading ended normally
+            raise
         except Exception as e:
-            print(f"\n❌ Fatal error: {e}")
+            logger.error(f"\n❌ Fatal error: {e}")
             await self.close_all_positions(symbol)
             raise
\ No newline at end of file
@@ -1,15 +1,27 @@
 import asyncio
+import logging
 import random
+from typing import Optional
 from src.core.api_client import AsterApiClient
+from src.core.book_ticker_stream import BookTickerStream
+from src.core.user_data_stream import UserDataStream
 from src.utils.position_calculator import PositionCalculator
 from src.bots.base_trading_bot import BaseTradingBot
 
+logger = logging.getLogger(__name__)
+
+# Position status polling interval and the lag after which a late check is reported
+CHECK_INTERVAL_SEC = 2
+MONITOR_LAG_WARNING_SEC = 1
+
 
 class VolumeTradingBot:
 
     def __init__(self, api_client: AsterApiClient, calculator: PositionCalculator,
                  min_close_time_sec: int, max_close_time_sec: int,
-                 max_loss_usdt: float, min_cycle_delay_sec: int, max_cycle_delay_sec: int):
+                 max_loss_usdt: float, min_cycle_delay_sec: int, max_cycle_delay_sec: int,
+                 user_stream: Optional[UserDataStream] = None, seed: Optional[int] = None,
+                 book_ticker: Optional[BookTickerStream] = None):
         self.api_client = api_client
         self.calculator = calculator
         self.min_close_time_sec = min_close_time_sec
@@ -19,7 +31,13 @@ class VolumeTradingBot:
         self.max_cycle_delay_sec = max_cycle_delay_sec
         self.total_pnl = 0.0
         self.cycles_completed = 0
-        self.base_bot = BaseTradingBot(api_client, calculator)
+        # One seeded generator shared with the base bot, so side choices and close times/delays are not correlated
+        self._rng = random.Random(seed)
+        self.base_bot = BaseTradingBot(api_client, calculator, user_stream, book_ticker=book_ticker, rng=self._rng)
+        # Set by the stream so monitoring re-checks as soon as the account changes
+        self._account_updated = asyncio.Event()
+        if user_stream:
+            user_stream.add_listener(self._account_updated.set)
 
     async def run_volume_trading_cycle(self, symbol: str, leverage: int) -> bool:
         if abs(self.total_pnl) >= self.max_loss_usdt:
@@ -29,26 +47,17 @@ class VolumeTradingBot:
             balance_before = await self.base_bot.get_usdt_balance()
             await self.base_bot.open_hedged_positions(symbol, leverage)
 
-            close_time = random.randint(self.min_close_time_sec, self.max_close_time_sec)
-            start_time = asyncio.get_event_loop().time()
-            check_interval = 2
-
-            while True:
-                elapsed = asyncio.get_event_loop().time() - start_time
-
-                position_status = await self.base_bot.check_positions_status(symbol)
-                current_pnl = position_status['total_pnl']
-
-                if current_pnl > 0:
-                    break
-
-                if elapsed >= close_time:
-                    break
+            # Close at the first positive PnL or once close_time runs out, whichever comes first
+            close_time = self._rng.randint(self.min_close_time_sec, self.max_close_time_sec)
+            try:
+                await asyncio.wait_for(self._wait_for_profit(symbol), timeout=close_time)
+            except asyncio.TimeoutError:
+                pass
 
-                await asyncio.sleep(check_interval)
-
-            await self.base_bot.close_positions(symbol)
-            await asyncio.sleep(1)
+            # Read the balance as soon as the close orders are confirmed filled
+            orders = await self.base_bot.close_positions(symbol)
+            if not await self.base_bot.wait_for_fills(symbol, orders):
+                logger.warning("⚠️ Close fills not confirmed - cycle PnL may be inaccurate")
 
             balance_after = await self.base_bot.get_usdt_balance()
             cycle_pnl = balance_after - balance_before
@@ -57,26 +66,54 @@ class VolumeTradingBot:
             self.cycles_completed += 1
 
             if cycle_pnl < 0:
-                print(f"❌ Loss: Cycle #{self.cycles_completed} | Loss: {abs(cycle_pnl):.4f} USDT | Total PnL: {self.total_pnl:.4f} USDT")
+                logger.info(f"❌ Loss: Cycle #{self.cycles_completed} | Loss: {abs(cycle_pnl):.4f} USDT | Total PnL: {self.total_pnl:.4f} USDT")
             else:
-                print(f"✅ Profit: Cycle #{self.cycles_completed} | Profit: {cycle_pnl:.4f} USDT | Total PnL: {self.total_pnl:.4f} USDT")
+                logger.info(f"✅ Profit: Cycle #{self.cycles_completed} | Profit: {cycle_pnl:.4f} USDT | Total PnL: {self.total_pnl:.4f} USDT")
 
             if abs(self.total_pnl) >= self.max_loss_usdt:
                 return False
 
-            delay = random.randint(self.min_cycle_delay_sec, self.max_cycle_delay_sec)
+            delay = self._rng.randint(self.min_cycle_delay_sec, self.max_cycle_delay_sec)
             await asyncio.sleep(delay)
 
             return True
 
         except Exception as e:
-            print(f"\n❌ Error in trading cycle: {e}")
+            logger.error(f"\n❌ Error in trading cycle: {e}")
             await self.base_bot.close_positions(symbol, silent=True)
             return False
 
+    async def _wait_for_profit(self, symbol: str) -> None:
+        """Poll the open positions until their combined PnL turns positive"""
+        now = asyncio.get_running_loop().time
+        next_check = now()
+        self._account_updated.clear()
+
+        while True:
+            position_status = await self.base_bot.check_positions_status(symbol)
+            if position_status['total_pnl'] > 0:
+                return
+
+            # Checks run on a fixed schedule so slow polls do not push later ones back
+            next_check += CHECK_INTERVAL_SEC
+            current_time = now()
+            if current_time - next_check > MONITOR_LAG_WARNING_SEC:
+                logger.warning(f"⚠️ Position check {current_time - next_check:.2f}s behind schedule")
+            next_check = max(next_check, current_time)
+
+            await self._wait_for_next_check(next_check - current_time)
+
+    async def _wait_for_next_check(self, interval: float) -> None:
+        """Sleep for the check interval, waking early when the stream reports an account change"""
+        try:
+            await asyncio.wait_for(self._account_updated.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+        self._account_updated.clear()
+
     async def start_volume_trading(self, symbol: str, leverage: int, hedge_mode: bool):
-        print(f"\n▶️ Volume Trading: {symbol} | Leverage: {leverage}x | Max Loss: {self.max_loss_usdt} USDT")
-        print(f"Close Time: {self.min_close_time_sec}-{self.max_close_time_sec}s | Delay: {self.min_cycle_delay_sec}-{self.max_cycle_delay_sec}s\n")
+        logger.info(f"\n▶️ Volume Trading: {symbol} | Leverage: {leverage}x | Max Loss: {self.max_loss_usdt} USDT")
+        logger.info(f"Close Time: {self.min_close_time_sec}-{self.max_close_time_sec}s | Delay: {self.min_cycle_delay_sec}-{self.max_cycle_delay_sec}s\n")
 
         await self.base_bot.setup_trading_environment(symbol, leverage, hedge_mode)
 
@@ -84,14 +121,16 @@ class VolumeTradingBot:
             while True:
                 should_continue = await self.run_volume_trading_cycle(symbol, leverage)
                 if not should_continue:
-                    print(f"\n⏹️ Stopped | Cycles: {self.cycles_completed} | Final PnL: {self.total_pnl:.4f} USDT")
+                    logger.info(f"\n⏹️ Stopped | Cycles: {self.cycles_completed} | Final PnL: {self.total_pnl:.4f} USDT")
                     break
 
-        except KeyboardInterrupt:
-            print(f"\n\n⚠️ Interrupted - Closing positions...")
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            logger.warning(f"\n\n⚠️ Interrupted - Closing positions...")
             await self.base_bot.close_positions(symbol)
-            print(f"Final: {self.cycles_completed} cycles | PnL: {self.total_pnl:.4f} USDT")
+            logger.info(f"Final: {self.cycles_completed} cycles | PnL: {self.total_pnl:.4f} USDT")
+            # Let the caller finish the cancellation instead of returning as if trading ended normally
+            raise
         except Exception as e:
-            print(f"\n❌ Fatal error: {e}")
+            logger.error(f"\n❌ Fatal error: {e}")
             await self.base_bot.close_positions(symbol, silent=True)
             raise
\ No newline at end of file
@@ -1,3 +1,7 @@
-from .api_client import AsterApiClient, SymbolInfo
+from .api_client import AsterApiClient, AsterApiError, SymbolInfo
+from .book_ticker_stream import BookTickerStream
+from .rate_limiter import RateLimiter
+from .user_data_stream import UserDataStream
 
-__all__ = ['AsterApiClient', 'SymbolInfo']
\ No newline at end of file
+__all__ = ['AsterApiClient', 'AsterApiError', 'SymbolInfo', 'BookTickerStream', 'RateLimiter',
+           'UserDataStream']
\ No newline at end of file
@@ -1,12 +1,53 @@
+import asyncio
 import aiohttp
+import orjson
 import hmac
 import hashlib
 import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from dataclasses import dataclass
+from decimal import Decimal
+from urllib.parse import urlencode
+from yarl import URL
+from src.core.rate_limiter import RateLimiter
 
 
-@dataclass
+# filterType -> SymbolInfo fields taken from that exchange filter
+_FILTER_PARSERS = {
+    'PRICE_FILTER': lambda f: {'tick_size': float(f['tickSize'])},
+    'LOT_SIZE': lambda f: {'step_size': float(f['stepSize']), 'min_qty': float(f['minQty'])},
+    'MIN_NOTIONAL': lambda f: {'min_notional': float(f['notional'])},
+}
+
+# Order rejections caused by stale symbol filters (precision, quantity or notional limits)
+SYMBOL_FILTER_ERROR_CODES = frozenset({-1013, -1111, -4004, -4005, -4164})
+# Most orders the batchOrders endpoint accepts per request
+MAX_BATCH_ORDERS = 5
+
+# Position mode change rejected because the account is already in that mode
+NO_NEED_TO_CHANGE_POSITION_SIDE = -4059
+
+
+def _to_param(value: Any) -> str:
+    """Render a request value, writing floats in plain notation since the exchange rejects 1e-05"""
+    if isinstance(value, float):
+        return format(Decimal(str(value)), 'f')
+    return str(value)
+
+
+class AsterApiError(Exception):
+    """Error response returned by the exchange"""
+
+    def __init__(self, status: int, code: Optional[int], message: str,
+                 retry_after: Optional[float] = None):
+        super().__init__(f"API request failed: HTTP {status} (code {code}): {message}")
+        self.status = status
+        self.code = code
+        self.message = message
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
 class SymbolInfo:
     tick_size: float
     step_size: float
@@ -16,98 +57,201 @@ class SymbolInfo:
 
 class AsterApiClient:
 
-    def __init__(self, api_key: str, secret_key: str, base_url: str, timeout: int = 30):
+    def __init__(self, api_key: str, secret_key: str, base_url: str, timeout: int = 30,
+                 retry_attempts: int = 3, retry_delay: float = 1, pool_size: int = 20,
+                 symbol_info_ttl: float = 300, connector: Optional[aiohttp.TCPConnector] = None,
+                 order_rate_limit: float = 10):
         self.api_key = api_key
         self.secret_key = secret_key
         self.base_url = base_url
         self.timeout = timeout
+        self.retry_attempts = retry_attempts
+        self.retry_delay = retry_delay
+        self.pool_size = pool_size
+        self.symbol_info_ttl = symbol_info_ttl
+        # Paces order submissions below the exchange's per-account order limit to avoid 429 backoffs
+        self._order_limiter = RateLimiter(order_rate_limit, max(order_rate_limit, MAX_BATCH_ORDERS))
+        # Parsed exchange filters indexed by symbol, refreshed every symbol_info_ttl seconds
+        self._symbol_info_cache: Dict[str, SymbolInfo] = {}
+        self._symbol_info_loaded_at: Optional[float] = None
+        # Lets concurrent callers share one exchangeInfo refresh instead of each fetching it
+        self._symbol_info_lock = asyncio.Lock()
         self.headers = {"X-MBX-APIKEY": self.api_key}
+        # Keyed once; each signature clones the precomputed inner/outer states
+        self._hmac_template = hmac.new(secret_key.encode('utf-8'), digestmod=hashlib.sha256)
+        # Optional pool shared with other clients; it is then owned and closed by the caller
+        self.connector = connector
         self.session: Optional[aiohttp.ClientSession] = None
 
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession(headers=self.headers)
+        await self.start()
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
+        await self.close()
 
-    def _create_signature(self, params: Dict[str, Any]) -> str:
-        query_string = '&'.join([f"{k}={v}" for k, v in params.items()])
-        return hmac.new(
-            self.secret_key.encode('utf-8'),
-            query_string.encode('utf-8'),
-            hashlib.sha256
-        ).hexdigest()
+    async def start(self) -> None:
+        """Open the HTTP session up front so the first trading request does not pay for it"""
+        if self.session is None:
+            self.session = self._create_session()
+
+    @staticmethod
+    def create_connector(pool_size: int = 20) -> aiohttp.TCPConnector:
+        # Keep TLS connections alive between calls instead of re-handshaking per request
+        return aiohttp.TCPConnector(
+            limit=100,
+            limit_per_host=pool_size,
+            keepalive_timeout=75,
+            ttl_dns_cache=300,
+            enable_cleanup_closed=True
+        )
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        shared = self.connector is not None
+        return aiohttp.ClientSession(
+            headers=self.headers,
+            connector=self.connector if shared else self.create_connector(self.pool_size),
+            connector_owner=not shared,
+            # The API is authenticated by headers and signatures; cookies are never needed
+            cookie_jar=aiohttp.DummyCookieJar(),
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+
+    def _create_signature(self, query_string: str) -> str:
+        signature = self._hmac_template.copy()
+        signature.update(query_string.encode('utf-8'))
+        return signature.hexdigest()
 
     async def _make_request(self, method: str, endpoint: str, params: Optional[Dict] = None,
-                           signed: bool = False) -> Dict[str, Any]:
+                           signed: bool = False, order_count: int = 0) -> Dict[str, Any]:
+        for attempt in range(self.retry_attempts + 1):
+            # Every send of an order request, retries included, counts against the order limit
+            if order_count:
+                await self._order_limiter.acquire(order_count)
+            try:
+                return await self._send_request(method, endpoint, params, signed)
+            except AsterApiError as e:
+                if attempt == self.retry_attempts or not self._should_retry(method, e.status):
+                    raise
+                delay = e.retry_after if e.retry_after is not None else self.retry_delay * 2 ** attempt
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # A failed write may still have reached the matching engine, so only reads are resent
+                if attempt == self.retry_attempts or method != 'GET':
+                    # Timeouts carry no message, so name the error type instead
+                    raise Exception(f"API request failed: {str(e) or type(e).__name__}")
+                delay = self.retry_delay * 2 ** attempt
+
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def _should_retry(method: str, status: int) -> bool:
+        # 429 means the request was rejected before execution; a 5xx on a write has unknown status
+        return status == 429 or (status >= 500 and method == 'GET')
+
+    async def _send_request(self, method: str, endpoint: str, params: Optional[Dict],
+                            signed: bool) -> Dict[str, Any]:
         if self.session is None:
-            self.session = aiohttp.ClientSession(headers=self.headers)
+            self.session = self._create_session()
 
         url = f"{self.base_url}{endpoint}"
 
-        if params is None:
-            params = {}
+        # Copy so a retry re-signs with a fresh timestamp instead of reusing the old one
+        params = dict(params) if params else {}
 
         if signed:
-            params['timestamp'] = int(time.time() * 1000)
-            params['signature'] = self._create_signature(params)
+            params['timestamp'] = time.time_ns() // 1_000_000
+            # Send exactly the bytes that were signed; encoded=True stops aiohttp re-quoting them
+            query_string = urlencode(params)
+            signature = self._create_signature(query_string)
+            url = URL(f"{url}?{query_string}&signature={signature}", encoded=True)
+            params = None
 
-        try:
-            timeout = aiohttp.ClientTimeout(total=self.timeout)
-
-            if method == 'GET':
-                async with self.session.get(url, params=params, timeout=timeout) as response:
-                    response.raise_for_status()
-                    return await response.json()
-            elif method == 'POST':
-                async with self.session.post(url, params=params, timeout=timeout) as response:
-                    response.raise_for_status()
-                    return await response.json()
-            elif method == 'DELETE':
-                async with self.session.delete(url, params=params, timeout=timeout) as response:
-                    response.raise_for_status()
-                    return await response.json()
-            else:
-                raise ValueError(f"Unsupported HTTP method: {method}")
-
-        except aiohttp.ClientError as e:
-            raise Exception(f"API request failed: {str(e)}")
+        async with self.session.request(method, url, params=params) as response:
+            return await self._read_response(response)
+
+    @staticmethod
+    async def _read_response(response: aiohttp.ClientResponse) -> Any:
+        body = await response.read()
+
+        if response.status >= 400:
+            try:
+                error = orjson.loads(body)
+            except orjson.JSONDecodeError:
+                error = None
+            if not isinstance(error, dict):
+                error = {}
+
+            try:
+                retry_after = float(response.headers.get('Retry-After', ''))
+            except ValueError:
+                retry_after = None
+
+            raise AsterApiError(response.status, error.get('code'),
+                                error.get('msg', response.reason), retry_after)
+
+        return orjson.loads(body)
 
     async def get_exchange_info(self) -> Dict[str, Any]:
         return await self._make_request('GET', '/fapi/v1/exchangeInfo')
 
-    async def get_symbol_info(self, symbol: str) -> Optional[SymbolInfo]:
-        exchange_info = await self.get_exchange_info()
-
-        for s in exchange_info.get('symbols', []):
-            if s['symbol'] == symbol:
-                filters = {}
-                for f in s['filters']:
-                    if f['filterType'] == 'PRICE_FILTER':
-                        filters['tick_size'] = float(f['tickSize'])
-                    elif f['filterType'] == 'LOT_SIZE':
-                        filters['step_size'] = float(f['stepSize'])
-                        filters['min_qty'] = float(f['minQty'])
-                    elif f['filterType'] == 'MIN_NOTIONAL':
-                        filters['min_notional'] = float(f['notional'])
-
-                if all(k in filters for k in ['tick_size', 'step_size', 'min_qty', 'min_notional']):
-                    return SymbolInfo(**filters)
+    @staticmethod
+    def _parse_symbol_info(symbol_data: Dict[str, Any]) -> Optional[SymbolInfo]:
+        filters = {}
+        for f in symbol_data['filters']:
+            parser = _FILTER_PARSERS.get(f['filterType'])
+            if parser:
+                filters.update(parser(f))
+
+        if all(k in filters for k in ['tick_size', 'step_size', 'min_qty', 'min_notional']):
+            return SymbolInfo(**filters)
         return None
 
+    def _symbol_info_expired(self) -> bool:
+        return (self._symbol_info_loaded_at is None
+                or time.monotonic() - self._symbol_info_loaded_at >= self.symbol_info_ttl)
+
+    async def get_symbol_info(self, symbol: str) -> Optional[SymbolInfo]:
+        if self._symbol_info_expired():
+            async with self._symbol_info_lock:
+                # Another caller may have refreshed the cache while this one waited for the lock
+                if self._symbol_info_expired():
+                    exchange_info = await self.get_exchange_info()
+                    symbol_info_cache = {}
+                    for s in exchange_info.get('symbols', []):
+                        symbol_info = self._parse_symbol_info(s)
+                        if symbol_info:
+                            symbol_info_cache[s['symbol']] = symbol_info
+                    self._symbol_info_cache = symbol_info_cache
+                    self._symbol_info_loaded_at = time.monotonic()
+
+        return self._symbol_info_cache.get(symbol)
+
+    def invalidate_symbol_info(self) -> None:
+        """Drop cached symbol filters so the next get_symbol_info call re-fetches them"""
+        self._symbol_info_loaded_at = None
+
     async def get_orderbook(self, symbol: str, limit: int = 5) -> Dict[str, Any]:
         params = {"symbol": symbol, "limit": limit}
         return await self._make_request('GET', '/fapi/v1/depth', params)
 
+    async def get_book_ticker(self, symbol: str) -> Dict[str, Any]:
+        params = {"symbol": symbol}
+        return await self._make_request('GET', '/fapi/v1/ticker/bookTicker', params)
+
     async def check_hedge_mode(self) -> bool:
         result = await self._make_request('GET', '/fapi/v1/positionSide/dual', signed=True)
         return result.get('dualSidePosition', False)
 
-    async def set_hedge_mode(self, enabled: bool) -> Dict[str, Any]:
-        params = {"dualSidePosition": str(enabled).lower()}
-        return await self._make_request('POST', '/fapi/v1/positionSide/dual', params, signed=True)
+    async def set_hedge_mode(self, enabled: bool) -> bool:
+        """Switch the position mode; returns False if the account was already in it"""
+        params = {"dualSidePosition": "true" if enabled else "false"}
+        try:
+            await self._make_request('POST', '/fapi/v1/positionSide/dual', params, signed=True)
+            return True
+        except AsterApiError as e:
+            if e.code != NO_NEED_TO_CHANGE_POSITION_SIDE:
+                raise
+            return False
 
     async def set_leverage(self, symbol: str, leverage: int) -> Dict[str, Any]:
         params = {"symbol": symbol, "leverage": leverage}
@@ -120,9 +264,38 @@ class AsterApiClient:
             "side": side,
             "positionSide": position_side,
             "type": order_type,
-            "quantity": quantity
+            "quantity": _to_param(quantity)
         }
-        return await self._make_request('POST', '/fapi/v1/order', params, signed=True)
+        try:
+            return await self._make_request('POST', '/fapi/v1/order', params, signed=True, order_count=1)
+        except AsterApiError as e:
+            # The symbol's filters may have changed; re-fetch them on the next sizing
+            if e.code in SYMBOL_FILTER_ERROR_CODES:
+                self.invalidate_symbol_info()
+            raise
+
+    async def place_batch_orders(self, orders: List[Dict[str, Any]]) -> List[Any]:
+        """Place up to MAX_BATCH_ORDERS orders in one request; rejected items are returned as AsterApiError"""
+        batch = [{key: _to_param(value) for key, value in order.items()} for order in orders]
+        params = {"batchOrders": orjson.dumps(batch).decode('utf-8')}
+        results = await self._make_request('POST', '/fapi/v1/batchOrders', params, signed=True,
+                                           order_count=len(orders))
+
+        parsed = []
+        for result in results:
+            if 'orderId' in result:
+                parsed.append(result)
+                continue
+            # The request succeeded but this item was rejected, so it is reported as a client error
+            error = AsterApiError(400, result.get('code'), result.get('msg', 'Batch order rejected'))
+            if error.code in SYMBOL_FILTER_ERROR_CODES:
+                self.invalidate_symbol_info()
+            parsed.append(error)
+        return parsed
+
+    async def get_order(self, symbol: str, order_id: int) -> Dict[str, Any]:
+        params = {"symbol": symbol, "orderId": order_id}
+        return await self._make_request('GET', '/fapi/v1/order', params, signed=True)
 
     async def get_position_risk(self, symbol: Optional[str] = None) -> Dict[str, Any]:
         params = {}
@@ -130,9 +303,27 @@ class AsterApiClient:
             params['symbol'] = symbol
         return await self._make_request('GET', '/fapi/v2/positionRisk', params, signed=True)
 
-    async def get_account_balance(self) -> Dict[str, Any]:
-        return await self._make_request('GET', '/fapi/v2/balance', signed=True)
+    async def get_account_balance(self) -> Dict[str, Dict[str, Any]]:
+        """Account balances keyed by asset"""
+        balances = await self._make_request('GET', '/fapi/v2/balance', signed=True)
+        return {balance['asset']: balance for balance in balances if isinstance(balance, dict)}
+
+    async def start_user_stream(self) -> str:
+        result = await self._make_request('POST', '/fapi/v1/listenKey')
+        return result['listenKey']
+
+    async def keepalive_user_stream(self) -> Dict[str, Any]:
+        return await self._make_request('PUT', '/fapi/v1/listenKey')
+
+    async def close_user_stream(self) -> Dict[str, Any]:
+        return await self._make_request('DELETE', '/fapi/v1/listenKey')
+
+    def connect_websocket(self, url: str):
+        if self.session is None:
+            self.session = self._create_session()
+        return self.session.ws_connect(url, heartbeat=30)
 
     async def close(self):
         if self.session:
-            await self.session.close()
\ No newline at end of file
+            await self.session.close()
+            self.session = None
\ No newline at end of file
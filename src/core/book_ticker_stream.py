@@ -0,0 +1,71 @@
+import asyncio
+import logging
+import aiohttp
+import orjson
+from typing import Optional, Tuple
+from src.core.api_client import AsterApiClient
+
+logger = logging.getLogger(__name__)
+
+
+class BookTickerStream:
+    """Tracks a symbol's best bid and ask from the <symbol>@bookTicker websocket"""
+
+    def __init__(self, api_client: AsterApiClient, symbol: str,
+                 ws_base_url: str = 'wss://fstream.asterdex.com', reconnect_delay_sec: float = 1):
+        self.api_client = api_client
+        self.symbol = symbol
+        self.ws_base_url = ws_base_url
+        self.reconnect_delay_sec = reconnect_delay_sec
+        self.connected = False
+        self.best_bid: Optional[float] = None
+        self.best_ask: Optional[float] = None
+        self._last_update_id = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def prices(self) -> Optional[Tuple[float, float]]:
+        """Latest (best_bid, best_ask), or None while the stream cannot be trusted"""
+        if not self.connected or self.best_bid is None or self.best_ask is None:
+            return None
+        return self.best_bid, self.best_ask
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.connected = False
+
+    async def _listen(self) -> None:
+        url = f"{self.ws_base_url}/ws/{self.symbol.lower()}@bookTicker"
+        while True:
+            try:
+                async with self.api_client.connect_websocket(url) as ws:
+                    self.connected = True
+                    async for msg in ws:
+                        if msg.type != aiohttp.WSMsgType.TEXT:
+                            break
+                        self._handle_event(orjson.loads(msg.data))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"⚠️ Book ticker stream disconnected: {e}")
+            except Exception as e:
+                # A malformed frame must not end the task with stale state still marked as connected
+                logger.error(f"❌ Error in book ticker stream: {e}")
+
+            # Prices from before the drop may be stale; readers fall back to REST until reconnected
+            self.connected = False
+            self.best_bid = self.best_ask = None
+            self._last_update_id = 0
+            await asyncio.sleep(self.reconnect_delay_sec)
+
+    def _handle_event(self, event: dict) -> None:
+        update_id = event.get('u', 0)
+        if update_id < self._last_update_id:
+            return
+        self._last_update_id = update_id
+        self.best_bid = float(event['b'])
+        self.best_ask = float(event['a'])
@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import aiohttp
+import orjson
+from typing import Dict, Any, Callable, Tuple, List
+from src.core.api_client import AsterApiClient
+
+logger = logging.getLogger(__name__)
+
+# Most recent fills remembered for wait_for_fills; older order ids are dropped first
+MAX_TRACKED_FILLS = 100
+
+
+class UserDataStream:
+    """Mirrors account positions and order fills from the user data websocket"""
+
+    def __init__(self, api_client: AsterApiClient, ws_base_url: str = 'wss://fstream.asterdex.com',
+                 keepalive_interval_sec: int = 30 * 60, reconnect_delay_sec: float = 1):
+        self.api_client = api_client
+        self.ws_base_url = ws_base_url
+        self.keepalive_interval_sec = keepalive_interval_sec
+        self.reconnect_delay_sec = reconnect_delay_sec
+        self.connected = False
+        # True once positions were loaded over REST for the current connection
+        self.positions_synced = False
+        # Position state per (symbol, positionSide), with the exchange time (ms) it was updated at
+        self.positions: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        # Order ids reported FILLED, kept in arrival order, and a signal for every order update
+        self._filled_orders: Dict[int, None] = {}
+        self._order_updated = asyncio.Event()
+        self._listeners: List[Callable[[], None]] = []
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        listen_key = await self.api_client.start_user_stream()
+        self._tasks = [
+            asyncio.create_task(self._listen(listen_key)),
+            asyncio.create_task(self._keepalive())
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.connected = False
+
+        try:
+            await self.api_client.close_user_stream()
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to close user data stream: {e}")
+
+    def add_listener(self, callback: Callable[[], None]) -> None:
+        """Register a callback invoked after every applied account update"""
+        self._listeners.append(callback)
+
+    async def wait_for_fills(self, order_ids: List[int], timeout: float) -> List[int]:
+        """Wait for the stream to report the orders FILLED; returns those still unconfirmed at timeout or disconnect"""
+        now = asyncio.get_running_loop().time
+        deadline = now() + timeout
+        pending = list(order_ids)
+
+        while True:
+            pending = [order_id for order_id in pending if order_id not in self._filled_orders]
+            remaining = deadline - now()
+            if not pending or not self.connected or remaining <= 0:
+                break
+            self._order_updated.clear()
+            try:
+                await asyncio.wait_for(self._order_updated.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+        for order_id in order_ids:
+            self._filled_orders.pop(order_id, None)
+        return pending
+
+    async def _keepalive(self) -> None:
+        while True:
+            await asyncio.sleep(self.keepalive_interval_sec)
+            try:
+                await self.api_client.keepalive_user_stream()
+            except Exception as e:
+                logger.warning(f"⚠️ User data stream keepalive failed: {e}")
+
+    async def _listen(self, listen_key: str) -> None:
+        while True:
+            try:
+                async with self.api_client.connect_websocket(f"{self.ws_base_url}/ws/{listen_key}") as ws:
+                    # Snapshot before reading events so anything pushed meanwhile is applied on top
+                    await self._seed_positions()
+                    self.connected = True
+                    async for msg in ws:
+                        if msg.type != aiohttp.WSMsgType.TEXT:
+                            break
+                        if not self._handle_event(orjson.loads(msg.data)):
+                            break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"⚠️ User data stream disconnected: {e}")
+            except Exception as e:
+                # A malformed frame must not end the task with stale state still marked as connected
+                logger.error(f"❌ Error in user data stream: {e}")
+
+            # Updates may have been missed; readers fall back to REST until the stream is back
+            self.connected = False
+            self.positions_synced = False
+            self.positions.clear()
+            self._filled_orders.clear()
+            # Wake fill waiters so they fall back to REST instead of waiting out their timeout
+            self._order_updated.set()
+            await asyncio.sleep(self.reconnect_delay_sec)
+
+            try:
+                listen_key = await self.api_client.start_user_stream()
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to renew user data stream: {e}")
+
+    async def _seed_positions(self) -> None:
+        """Load open positions over REST since the stream only pushes positions that change"""
+        try:
+            positions = await self.api_client.get_position_risk()
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to load positions for user data stream: {e}")
+            return
+
+        for pos in positions:
+            if isinstance(pos, dict) and 'positionAmt' in pos:
+                self.positions[(pos['symbol'], pos['positionSide'])] = {
+                    'side': pos['positionSide'],
+                    'amount': float(pos['positionAmt']),
+                    'entry_price': float(pos['entryPrice']),
+                    'unrealized_pnl': float(pos['unRealizedProfit']),
+                    'margin': float(pos.get('isolatedWallet', 0)),
+                    'update_time': int(pos.get('updateTime', 0))
+                }
+        self.positions_synced = True
+
+    def _handle_event(self, event: Dict[str, Any]) -> bool:
+        """Apply a stream event; returns False when the connection must be re-established"""
+        event_type = event.get('e')
+
+        if event_type == 'listenKeyExpired':
+            return False
+
+        if event_type == 'ACCOUNT_UPDATE':
+            # Payloads are not guaranteed to arrive in order, so a position is only replaced by a newer update
+            event_time = event.get('E', 0)
+            applied = False
+
+            update = event.get('a', {})
+            for pos in update.get('P', []):
+                key = (pos['s'], pos['ps'])
+                if key in self.positions and event_time < self.positions[key]['update_time']:
+                    continue
+                self.positions[key] = {
+                    'side': pos['ps'],
+                    'amount': float(pos['pa']),
+                    'entry_price': float(pos['ep']),
+                    'unrealized_pnl': float(pos['up']),
+                    'margin': float(pos['iw']),
+                    'update_time': event_time
+                }
+                applied = True
+
+            if applied:
+                for callback in self._listeners:
+                    callback()
+
+        elif event_type == 'ORDER_TRADE_UPDATE':
+            order = event.get('o', {})
+            if order.get('X') == 'FILLED':
+                self._filled_orders[order['i']] = None
+                if len(self._filled_orders) > MAX_TRACKED_FILLS:
+                    del self._filled_orders[next(iter(self._filled_orders))]
+                self._order_updated.set()
+
+        return True
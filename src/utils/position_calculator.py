@@ -1,23 +1,38 @@
+import math
+from decimal import Decimal
 from src.core.api_client import SymbolInfo
 
+# Absorbs float error when a quantity is already an exact multiple of the step size
+STEP_EPSILON = 1e-9
+
 
 class PositionCalculator:
 
     def __init__(self, liquidity_multiplier: float = 1.2, balance_percentage: float = 50):
         self.liquidity_multiplier = liquidity_multiplier
         self.balance_percentage = balance_percentage
+        # Share of the balance used per order, for one position (dual) or each of two (hedge)
+        self._single_fraction = balance_percentage / 100.0
+        self._hedge_fraction = balance_percentage / 200.0
 
     def calculate_position_size(self, symbol_info: SymbolInfo, price: float,
                                available_balance: float, leverage: int,
                                single_position: bool = False) -> float:
         # For dual mode (single position per account) don't divide by 2
         # For hedge mode (two positions on same account) divide by 2
-        divider = 1 if single_position else 2
-        max_position_value = (available_balance * (self.balance_percentage / 100)) / divider
-        max_position_value_with_leverage = max_position_value * leverage
-        max_quantity = max_position_value_with_leverage / price
-        min_notional_qty = (symbol_info.min_notional * self.liquidity_multiplier) / price
+        fraction = self._single_fraction if single_position else self._hedge_fraction
+        step_size = symbol_info.step_size
+        inv_price = 1.0 / price
+        max_quantity = available_balance * fraction * leverage * inv_price
+        min_notional_qty = symbol_info.min_notional * self.liquidity_multiplier * inv_price
         min_required = max(min_notional_qty, symbol_info.min_qty)
-        quantity = max(min_required, min(max_quantity, max_quantity))
-        quantity = round(quantity / symbol_info.step_size) * symbol_info.step_size
-        return quantity
\ No newline at end of file
+
+        # Round the budget down, but never below the minimum notional and quantity rounded up,
+        # since flooring a budget just above the minimum can land a step under it
+        steps = max(
+            math.floor(max_quantity / step_size + STEP_EPSILON),
+            math.ceil(min_required / step_size - STEP_EPSILON)
+        )
+
+        # Whole steps times the exact decimal step, so no float artifacts such as 0.30000000000000004 reach the exchange
+        return float(steps * Decimal(str(step_size)))
@@ -0,0 +1,22 @@
+from src.core.api_client import SymbolInfo
+from src.utils.position_calculator import PositionCalculator
+
+
+def test_floored_budget_is_not_below_min_notional():
+    symbol_info = SymbolInfo(tick_size=0.1, step_size=0.001, min_qty=0.001, min_notional=120)
+    calculator = PositionCalculator(liquidity_multiplier=1.0, balance_percentage=50)
+
+    # Budget allows 0.0029; flooring alone gives 0.002 (100 USDT) against a 120 USDT minimum
+    quantity = calculator.calculate_position_size(symbol_info, 50000, 14.5, 20, single_position=True)
+
+    assert quantity == 0.003
+    assert quantity * 50000 >= 120
+
+
+def test_quantity_floors_to_step_within_budget():
+    symbol_info = SymbolInfo(tick_size=0.1, step_size=0.001, min_qty=0.001, min_notional=5)
+    calculator = PositionCalculator(liquidity_multiplier=1.2, balance_percentage=50)
+
+    quantity = calculator.calculate_position_size(symbol_info, 50000, 14.5, 20, single_position=True)
+
+    assert quantity == 0.002